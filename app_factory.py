@@ -3,6 +3,16 @@ from flask_cors import CORS
 import os
 import sys
 
+try:
+    from flask_compress import Compress
+except ImportError:
+    Compress = None
+
+try:
+    from whitenoise import WhiteNoise
+except ImportError:
+    WhiteNoise = None
+
 def create_app():
 
     app = Flask(__name__)
@@ -11,6 +21,17 @@ def create_app():
         static_folder = os.path.join(sys._MEIPASS, 'static')
         app = Flask(__name__, template_folder=template_folder, static_folder=static_folder)
     CORS(app)
+    if Compress is not None:
+        # Compress listings/file views; streamed responses (SSE, /view) are left alone
+        app.config['COMPRESS_MIMETYPES'] = ['text/html', 'application/json', 'text/plain']
+        app.config['COMPRESS_LEVEL'] = 6
+        app.config['COMPRESS_MIN_SIZE'] = 500
+        app.config['COMPRESS_STREAMS'] = False
+        Compress(app)
+    if WhiteNoise is not None:
+        # Serve basic-web-ui/ assets ahead of Flask; main.serve_static remains the fallback
+        app.wsgi_app = WhiteNoise(app.wsgi_app, root=os.path.join(app.root_path, 'basic-web-ui'),
+                                  prefix='basic-web-ui/', max_age=3600)
     return app
 
 app = create_app()
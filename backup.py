@@ -1,9 +1,11 @@
 import os
-import json
+import hashlib
 import subprocess
+import threading
+from collections import OrderedDict
 from flask import Flask, request, jsonify, send_from_directory, Response
 from app_factory import app
-from utils import extract_password_and_launch_backup, get_password_from_header, load_config, save_config, execute_restic_command
+from utils import extract_password_and_launch_backup, get_password_from_header, load_config, save_config, execute_restic_command, iter_output_lines, sse_event, SSE_HEADERS, SSE_HEARTBEAT, HEARTBEAT_INTERVAL
 
 
 
@@ -12,23 +14,52 @@ def parse_snapshots_output(output):
     snapshots = []
     lines = output.strip().split('\n')
     
-    for line in lines[2:]:  # Skip header lines
-        if line.strip():
-            parts = line.split()
-            if len(parts) >= 4:
-                snapshot_id = parts[0]
-                date_str = ' '.join(parts[1:3])
-                # Try to find size info (may not always be present)
-                size = ' '.join(parts[4:6])
-                
-                snapshots.append({
-                    'snapshot_id': snapshot_id,
-                    'date': date_str,
-                    'size': size
-                })
+    # Skip header lines; split() already yields [] for blank lines, so no separate strip() check
+    for parts in map(str.split, lines[2:]):
+        if len(parts) >= 4:
+            snapshot_id = parts[0]
+            date_str = f'{parts[1]} {parts[2]}'
+            # Try to find size info (may not always be present)
+            size = ' '.join(parts[4:6])
+            
+            snapshots.append({
+                'snapshot_id': snapshot_id,
+                'date': date_str,
+                'size': size
+            })
     
     return snapshots
 
+# Snapshot listings keyed on (repo, password hash, path filter), with the
+# snapshots/ directory mtime they were read at; least recently used entries
+# are evicted past SNAPSHOT_CACHE_SIZE
+SNAPSHOT_CACHE_SIZE = 64
+snapshot_cache = OrderedDict()
+snapshot_cache_lock = threading.Lock()
+
+def get_cached_snapshots(cache_key):
+    """Return the (mtime, snapshots) cached for cache_key, marking it recently used"""
+    with snapshot_cache_lock:
+        cached = snapshot_cache.get(cache_key)
+        if cached:
+            snapshot_cache.move_to_end(cache_key)
+        return cached
+
+def cache_snapshots(cache_key, value):
+    """Store (mtime, snapshots) for cache_key, evicting the least recently used entry when full"""
+    with snapshot_cache_lock:
+        snapshot_cache[cache_key] = value
+        snapshot_cache.move_to_end(cache_key)
+        if len(snapshot_cache) > SNAPSHOT_CACHE_SIZE:
+            snapshot_cache.popitem(last=False)
+
+def get_snapshots_mtime(repo_path):
+    """mtime of a local repository's snapshots/ directory; None for remote repositories"""
+    try:
+        # Every backup, forget or prune adds or removes a file in snapshots/
+        return os.stat(os.path.join(repo_path, 'snapshots')).st_mtime_ns
+    except (OSError, ValueError):
+        return None
 
 
 @app.route('/locations', methods=['POST'])
@@ -50,10 +81,11 @@ def init_location():
         env_vars = {'RESTIC_PASSWORD': password}
         
         result = execute_restic_command(cmd, env_vars)
-        print(result.stderr, flush=True)
+        stderr = result.stderr.decode('utf-8', 'replace')
+        print(stderr, flush=True)
         
         if result.returncode != 0:
-            return jsonify({'error': f'Failed to initialize repository: {result.stderr}'}), 500
+            return jsonify({'error': f'Failed to initialize repository: {stderr}'}), 500
         
         # Update config with new location
         config = load_config()
@@ -92,19 +124,33 @@ def list_backups(location_id):
         repo_path = config['locations'][location_id]['repo_path']
         path_filter = request.args.get('path', '')
         
-        # Build restic snapshots command
-        cmd = ['restic', 'snapshots', '--repo', repo_path, '--compact']
-        if path_filter:
-            cmd.extend(['--path', path_filter])
-        
-        env_vars = {'RESTIC_PASSWORD': password}
-        result = execute_restic_command(cmd, env_vars)
-        
-        if result.returncode != 0:
-            return jsonify({'error': f'Failed to list snapshots: {result.stderr}'}), 500
+        # Reuse the last listing while the repo's snapshots/ directory is unchanged;
+        # the password is part of the key so a wrong one can't read a cached listing
+        cache_key = (repo_path, hashlib.sha256(password.encode()).hexdigest(), path_filter)
+        snapshots_mtime = get_snapshots_mtime(repo_path)
+        cached = get_cached_snapshots(cache_key)
+        if snapshots_mtime is not None and cached and cached[0] == snapshots_mtime:
+            snapshots = cached[1]
+        else:
+            # Build restic snapshots command
+            cmd = ['restic', 'snapshots', '--repo', repo_path, '--compact']
+            if path_filter:
+                cmd.extend(['--path', path_filter])
+            
+            env_vars = {'RESTIC_PASSWORD': password}
+            result = execute_restic_command(cmd, env_vars)
+            
+            if result.returncode != 0:
+                return jsonify({'error': f"Failed to list snapshots: {result.stderr.decode('utf-8', 'replace')}"}), 500
+            
+            snapshots = parse_snapshots_output(result.stdout.decode('utf-8', 'replace'))
+            if snapshots_mtime is not None:
+                cache_snapshots(cache_key, (snapshots_mtime, snapshots))
         
-        snapshots = parse_snapshots_output(result.stdout)
-        return jsonify(snapshots)
+        # Let the polling web UI revalidate with If-None-Match and get a 304
+        response = jsonify(snapshots)
+        response.add_etag()
+        return response.make_conditional(request)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -158,18 +204,13 @@ def list_backup_contents(location_id, backup_id):
         result = execute_restic_command(cmd, env_vars)
         
         if result.returncode != 0:
-            return jsonify({'error': f'Failed to list backup contents: {result.stderr}'}), 500
-        
-        # Parse JSON output
-        contents = []
-        for line in result.stdout.strip().split('\n'):
-            if line:
-                try:
-                    contents.append(json.loads(line))
-                except json.JSONDecodeError:
-                    continue
+            return jsonify({'error': f"Failed to list backup contents: {result.stderr.decode('utf-8', 'replace')}"}), 500
         
-        return jsonify(contents)
+        # restic already emits one JSON object per line; join them into an array
+        # as bytes instead of parsing and re-serializing every entry. Keep only
+        # object lines so a stray warning on stdout can't corrupt the array
+        lines = [line for line in map(bytes.strip, result.stdout.splitlines()) if line.startswith(b'{')]
+        return Response(b'[' + b','.join(lines) + b']', mimetype='application/json')
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -183,13 +224,13 @@ def count_files_in_snapshot(snapshot_id, repo_path, password):
         
         if process.returncode == 0:
             # Count lines in output (each line is a file/directory)
-            stdout = process.stdout.strip().split('\n')
+            stdout = process.stdout.strip().split(b'\n')
             file_count = len([line for line in stdout if line.strip()])
             
             top_level_dir = None
             for line in stdout:
                 if line.strip():
-                    top_level_dir = line.split("/")[1]
+                    top_level_dir = line.split(b"/")[1].decode('utf-8', 'replace')
                     break
             return [file_count, top_level_dir]
         return 0
@@ -204,23 +245,25 @@ def generate_restore_stream(cmd, env_vars, target_path, total_files=0, top_level
     last_progress = -1
     
     try:
-        for line in iter(process.stdout.readline, ''):
-            if line:
-                processed_files += 1
+        for line in iter_output_lines(process.stdout, HEARTBEAT_INTERVAL):
+            if line is None:
+                yield SSE_HEARTBEAT
+                continue
+            processed_files += 1
+            
+            # Calculate progress percentage
+            if total_files > 0:
+                progress = min(int((processed_files / total_files) * 100), 100)
                 
-                # Calculate progress percentage
-                if total_files > 0:
-                    progress = min(int((processed_files / total_files) * 100), 100)
-                    
-                    # Only send progress updates every 5% to reduce frontend load
-                    if progress != last_progress and progress % 5 == 0:
-                        yield f"data: {json.dumps({'progress': progress, 'processed': processed_files, 'total': total_files})}\n\n"
-                        last_progress = progress
-                else:
-                    # Fallback: send periodic updates without percentage
-                    if processed_files % 100 == 0:  # Every 100 files
-                        yield f"data: {json.dumps({'processed': processed_files, 'message': f'Processed {processed_files} files...'})}\n\n"
-        
+                # Only send progress updates every 5% to reduce frontend load
+                if progress != last_progress and progress % 5 == 0:
+                    yield sse_event({'progress': progress, 'processed': processed_files, 'total': total_files})
+                    last_progress = progress
+            else:
+                # Fallback: send periodic updates without percentage
+                if processed_files % 100 == 0:  # Every 100 files
+                    yield sse_event({'processed': processed_files, 'message': f'Processed {processed_files} files...'})
+    
         process.wait()
         
         # If restore was successful, add target path to config
@@ -238,12 +281,12 @@ def generate_restore_stream(cmd, env_vars, target_path, total_files=0, top_level
             
             # Include browse link in the response
             browse_link = f"/browse{final_path}"
-            yield f"data: {json.dumps({'completed': True, 'success': True, 'browse_link': browse_link, 'total_processed': processed_files})}\n\n"
+            yield sse_event({'completed': True, 'success': True, 'browse_link': browse_link, 'total_processed': processed_files})
         else:
-            yield f"data: {json.dumps({'completed': True, 'success': False})}\n\n"
+            yield sse_event({'completed': True, 'success': False})
         
     except Exception as e:
-        yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        yield sse_event({'error': str(e)})
     finally:
         if process.poll() is None:
             process.terminate()
@@ -275,20 +318,20 @@ def restore_backup(location_id, backup_id):
         env_vars = {'RESTIC_PASSWORD': password}
         
         def event_stream():
-            yield "data: {\"message\": \"Starting restore...\"}\n\n"
+            yield sse_event({'message': 'Starting restore...'})
             
             # Count files in snapshot for progress tracking
-            yield "data: {\"message\": \"Counting files in snapshot...\"}\n\n"
+            yield sse_event({'message': 'Counting files in snapshot...'})
             total_files, top_level_dir = count_files_in_snapshot(backup_id, repo_path, password)
             
             if total_files > 0:
-                yield f"data: {{\"message\": \"Found {total_files} files to restore. Starting restore...\"}}\n\n"
+                yield sse_event({'message': f'Found {total_files} files to restore. Starting restore...'})
             else:
-                yield "data: {\"message\": \"Starting restore (file count unavailable)...\"}\n\n"
+                yield sse_event({'message': 'Starting restore (file count unavailable)...'})
             
             yield from generate_restore_stream(cmd, env_vars, target, total_files, top_level_dir)
         
-        return Response(event_stream(), mimetype='text/event-stream')
+        return Response(event_stream(), mimetype='text/event-stream', headers=SSE_HEADERS)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,10 +1,109 @@
+import codecs
 import os
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
-from flask import jsonify, render_template
+from flask import Response, jsonify, request, stream_with_context
 from utils import load_config
 
 from app_factory import app
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@lru_cache(maxsize=8)
+def get_restore_bases(restored_paths):
+    """
+    Sorted root prefixes (root + sep), their (root, parent) pairs and, for each
+    prefix, the index of the closest root enclosing it (-1 if none); computed once per config
+    """
+    bases = {}
+    for path_in_config in restored_paths:
+        path_in_config = os.path.normpath(path_in_config)
+        bases.setdefault(path_in_config.rstrip(os.sep) + os.sep,
+                         (path_in_config, path_in_config.rsplit('/', 1)[0]))
+    prefixes = tuple(sorted(bases))
+    # In sorted order a root's enclosing roots are all on the stack of open ancestors
+    enclosing = []
+    stack = []
+    for idx, prefix in enumerate(prefixes):
+        while stack and not prefix.startswith(prefixes[stack[-1]]):
+            stack.pop()
+        enclosing.append(stack[-1] if stack else -1)
+        stack.append(idx)
+    return prefixes, tuple(bases[prefix] for prefix in prefixes), tuple(enclosing)
+
+def find_restore_root(restore_bases, path_prefix):
+    """Index of the longest root prefix of path_prefix, or -1"""
+    root_prefixes, _, enclosing = restore_bases
+    # The last prefix sorting at or before the path is the candidate; if it isn't
+    # a prefix of the path, the match is among the roots enclosing it
+    idx = bisect_right(root_prefixes, path_prefix) - 1
+    while idx >= 0 and not path_prefix.startswith(root_prefixes[idx]):
+        idx = enclosing[idx]
+    return idx
+
+@lru_cache(maxsize=8)
+def get_restored_prefixes(restored_paths):
+    """Resolved restored paths with a trailing separator, for one startswith() call"""
+    return tuple(os.path.realpath(path).rstrip(os.sep) + os.sep for path in restored_paths)
+
+def entry_size(entry):
+    """Size of a file entry, 0 if it can't be stat'ed"""
+    try:
+        return entry.stat().st_size
+    except OSError:
+        return 0
+
+@lru_cache(maxsize=1)
+def get_browse_template():
+    """Compiled browse.html, loaded on first use (after the format_size filter is registered)"""
+    return app.jinja_env.get_template('browse.html')
+
+# Shared pool for stat calls; on NFS/SMB mounts each DirEntry.stat() is a network round trip
+stat_pool = ThreadPoolExecutor(max_workers=16)
+
+@lru_cache(maxsize=256)
+def list_directory(restore_path, mtime_ns):
+    """List directory entries; cached until the directory's mtime changes"""
+    items = []
+    # One scandir pass: DirEntry caches the type from readdir, so only files need a stat
+    with os.scandir(restore_path) as it:
+        entries = list(it)
+    # Case-insensitive order; key= lowers each name once rather than per comparison
+    entries.sort(key=lambda entry: entry.name.lower())
+    files = [entry for entry in entries if not entry.is_dir()]
+    # Overlap the stat round trips for big directories; small ones aren't worth the handoff
+    if len(files) > 64:
+        sizes = dict(zip(files, stat_pool.map(entry_size, files)))
+    else:
+        sizes = {entry: entry_size(entry) for entry in files}
+    for entry in entries:
+        item = entry.name
+        item_path = entry.path
+        is_dir = entry.is_dir()
+        
+        # Get file size for files
+        size = None if is_dir else sizes[entry]
+        
+        # Create clickable path for directories (relative path without leading slash)
+        clickable_path = None
+        if is_dir:
+            clickable_path = item_path.lstrip('/')
+        
+        items.append({
+            'name': item,
+            'is_directory': is_dir,
+            'size': size,
+            'path': item_path,
+            'clickable_path': clickable_path  # For directory navigation
+        })
+    return items
+
 
 @app.route('/browse/<path:restore_path>')
 def browse_restored_content(restore_path):
@@ -12,27 +111,19 @@ def browse_restored_content(restore_path):
     try:
         # Load config to validate restored paths
         config = load_config()
-        restored_paths = config.get('restored_paths', [])
+        restore_bases = get_restore_bases(tuple(config.get('restored_paths', [])))
         
         # Normalize the requested path
         restore_path = '/' + restore_path if not restore_path.startswith('/') else restore_path
         restore_path = os.path.normpath(restore_path)
         
         # Validate that the requested path is within one of our restored directories
-        # and restrict access to only the first directory inside restore_path
-        is_valid_path = False
-        base_restore_path = None
-        matching_config_path = None
-        
-        for path_in_config in restored_paths:
-            if restore_path.startswith(path_in_config):
-                is_valid_path = True
-                matching_config_path = path_in_config
-                base_restore_path = "/".join(matching_config_path.split("/")[:-1])
-                break
-        
-        if not is_valid_path:
+        # and restrict access to only the first directory inside restore_path.
+        # With nested restores the innermost (longest) matching root anchors the breadcrumbs
+        idx = find_restore_root(restore_bases, restore_path.rstrip(os.sep) + os.sep)
+        if idx < 0:
             return jsonify({'error': 'Access denied. Path not found in allowed directories.'}), 403
+        matching_config_path, base_restore_path = restore_bases[1][idx]
         
         # Check if directory exists
         if not os.path.exists(restore_path) or not os.path.isdir(restore_path):
@@ -62,41 +153,27 @@ def browse_restored_content(restore_path):
             'path': allowed_relative_path
         })
         
-        # Get directory contents
+        # Get directory contents; a cache hit costs only this stat call
         try:
-            items = []
-            for item in sorted(os.listdir(restore_path)):
-                item_path = os.path.join(restore_path, item)
-                is_dir = os.path.isdir(item_path)
-                
-                # Get file size for files
-                size = None
-                if not is_dir:
-                    try:
-                        size = os.path.getsize(item_path)
-                    except:
-                        size = 0
-                
-                # Create clickable path for directories (relative path without leading slash)
-                clickable_path = None
-                if is_dir:
-                    clickable_path = item_path.lstrip('/')
-                
-                items.append({
-                    'name': item,
-                    'is_directory': is_dir,
-                    'size': size,
-                    'path': item_path,
-                    'clickable_path': clickable_path  # For directory navigation
-                })
+            items = list_directory(restore_path, os.stat(restore_path).st_mtime_ns)
             
+            # API clients asking for JSON get the listing without the Jinja render
+            if request.accept_mimetypes.best == 'application/json':
+                listing = {
+                    'path': restore_path,
+                    'base_path': base_restore_path,
+                    'items': items,
+                    'breadcrumbs': breadcrumbs
+                }
+                if orjson is not None:
+                    return Response(orjson.dumps(listing), mimetype='application/json')
+                return jsonify(listing)
             
-            return render_template('browse.html', 
-                                 path=restore_path,
-                                 base_path=base_restore_path,
-                                 items=items,
-                                 breadcrumbs=breadcrumbs,
-                                 format_size=format_size)
+            html = get_browse_template().render(path=restore_path,
+                                                base_path=base_restore_path,
+                                                items=items,
+                                                breadcrumbs=breadcrumbs)
+            return Response(html, mimetype='text/html')
             
         except PermissionError:
             return jsonify({'error': 'Permission denied accessing directory.'}), 403
@@ -114,47 +191,58 @@ def view_file_content(file_path):
         config = load_config()
         restored_paths = config.get('restored_paths', [])
         
-        # Normalize the requested file path
-        file_path = '/' + file_path.strip('/')
+        # Resolve the requested file path so '..' and symlinks can't escape a restored directory
+        file_path = os.path.realpath('/' + file_path.strip('/'))
         
         # Validate that the file path is within a restored directory
-        is_valid = False
-        for restored_path in restored_paths:
-            if file_path.startswith(restored_path):
-                is_valid = True
-                break
-        
-        if not is_valid:
+        if not file_path.startswith(get_restored_prefixes(tuple(restored_paths))):
             return "Access denied: File not in restored directory", 403
             
         # Check if file exists and is actually a file
         if not os.path.exists(file_path) or not os.path.isfile(file_path):
             return "File not found", 404
             
-        # Try to read and display file content
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Return as plain text with proper content type
-            from flask import Response
-            return Response(content, mimetype='text/plain')
-            
-        except UnicodeDecodeError:
+        # Sniff the first block: NUL bytes or invalid UTF-8 mean binary, then
+        # stream the rest in 64 KiB chunks
+        f = open(file_path, 'rb', buffering=1 << 16)
+        first_chunk = f.read(65536)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        is_binary = b'\0' in first_chunk
+        if not is_binary:
+            try:
+                first_text = decoder.decode(first_chunk, final=len(first_chunk) < 65536)
+            except UnicodeDecodeError:
+                is_binary = True
+        if is_binary:
+            f.close()
             # If file is binary, show info instead of content
             file_size = os.path.getsize(file_path)
             return f"Binary file: {os.path.basename(file_path)}\nSize: {format_size(file_size)}\nCannot display binary content."
+        
+        def generate():
+            # Past the sniffed block the response is already committed, so
+            # invalid bytes further in are replaced rather than failing it
+            decoder.errors = 'replace'
+            with f:
+                yield first_text
+                while chunk := f.read(65536):
+                    yield decoder.decode(chunk)
+                yield decoder.decode(b'', final=True)
+        
+        # Return as plain text with proper content type
+        return Response(stream_with_context(generate()), mimetype='text/plain')
             
     except Exception as e:
         return f"Error reading file: {str(e)}", 500
     
 # Helper function for formatting file sizes
+SIZE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
+
+@app.template_filter('format_size')
 def format_size(size_bytes):
-    if size_bytes == 0:
+    if size_bytes <= 0:
         return "0 B"
-    size_names = ["B", "KB", "MB", "GB", "TB"]
-    import math
-    i = int(math.floor(math.log(size_bytes, 1024)))
-    p = math.pow(1024, i)
-    s = round(size_bytes / p, 2)
-    return f"{s} {size_names[i]}"
+    # bit_length gives floor(log1024) with integer ops instead of math.log/math.pow
+    i = min((size_bytes.bit_length() - 1) // 10, len(SIZE_UNITS) - 1)
+    s = round(size_bytes / (1 << (10 * i)), 2)
+    return f"{s} {SIZE_UNITS[i]}"
@@ -6,63 +6,37 @@ Handles complete installation of Restic API server on Windows
 
 import os
 import sys
+import platform
 import subprocess
-import urllib.request
 import zipfile
 import shutil
 import json
 from pathlib import Path
 
+def fast_copy(src, dst):
+    """Copy a file with metadata, using CopyFileW on Windows so the copy happens
+    in the OS (server-side on SMB shares) instead of through Python buffers"""
+    if os.name == 'nt':
+        import ctypes
+        if ctypes.windll.kernel32.CopyFileW(str(src), str(dst), False):
+            shutil.copystat(src, dst)
+            return
+    shutil.copy2(src, dst)
+
 class ResticAPIInstaller:
     def __init__(self):
         self.install_dir = Path.home() / "ResticAPI"
-        self.python_url = "https://www.python.org/ftp/python/3.11.7/python-3.11.7-amd64.exe"
-        self.python_installer = "python_installer.exe"
         
     def log(self, message):
         print(f"[INSTALLER] {message}")
         
     def check_python(self):
-        """Check if Python is installed and accessible"""
-        try:
-            result = subprocess.run([sys.executable, "--version"], 
-                                  capture_output=True, text=True)
-            if result.returncode == 0:
-                self.log(f"Python found: {result.stdout.strip()}")
-                return True
-        except FileNotFoundError:
-            pass
-        
-        self.log("Python not found or not accessible")
-        return False
+        """Report the Python running the installer"""
+        # The installer is itself running on the Python we need, so there is
+        # nothing to probe, download or install
+        self.log(f"Python found: Python {platform.python_version()}")
+        return True
         
-    def install_python(self):
-        """Download and install Python if not present"""
-        if self.check_python():
-            return True
-            
-        self.log("Downloading Python installer...")
-        try:
-            urllib.request.urlretrieve(self.python_url, self.python_installer)
-            self.log("Installing Python (this may take a few minutes)...")
-            
-            # Install Python silently with pip and add to PATH
-            subprocess.run([
-                self.python_installer,
-                "/quiet",
-                "InstallAllUsers=1",
-                "PrependPath=1",
-                "Include_pip=1"
-            ], check=True)
-            
-            os.remove(self.python_installer)
-            self.log("Python installation completed")
-            return True
-            
-        except Exception as e:
-            self.log(f"Failed to install Python: {e}")
-            return False
-            
     def create_install_directory(self):
         """Create installation directory"""
         try:
@@ -91,7 +65,7 @@ class ResticAPIInstaller:
                 dst = self.install_dir / file_name
                 
                 if src.exists():
-                    shutil.copy2(src, dst)
+                    fast_copy(src, dst)
                     self.log(f"Copied: {file_name}")
                 else:
                     self.log(f"Warning: {file_name} not found")
@@ -112,11 +86,14 @@ class ResticAPIInstaller:
                     f.write("flask>=2.0.0\n")
                     f.write("flask-cors>=3.0.0\n")
                     f.write("requests>=2.25.0\n")
+                    f.write("waitress>=2.1.0\n")
             
             self.log("Installing Python dependencies...")
+            # Wheels only and no version check/prompts: skips source builds and pip's self-update probe
             subprocess.run([
-                sys.executable, "-m", "pip", "install", "-r", 
-                str(requirements_file)
+                sys.executable, "-m", "pip", "install",
+                "--disable-pip-version-check", "--only-binary=:all:", "--no-input",
+                "-r", str(requirements_file)
             ], check=True, cwd=str(self.install_dir))
             
             self.log("Dependencies installed successfully")
@@ -170,13 +147,22 @@ start_server.bat
             self.log(f"Failed to create desktop shortcut: {e}")
             return False
             
+    def run_step(self, step_name, step_func):
+        """Run a single installation step, logging its outcome"""
+        self.log(f"Step: {step_name}")
+        if not step_func():
+            self.log(f"Installation failed at step: {step_name}")
+            return False
+        self.log(f"Step completed: {step_name}")
+        return True
+        
     def run_installation(self):
         """Run the complete installation process"""
         self.log("Starting Restic API installation...")
         self.log("=" * 50)
         
         steps = [
-            ("Checking/Installing Python", self.install_python),
+            ("Checking Python", self.check_python),
             ("Creating installation directory", self.create_install_directory),
             ("Copying application files", self.copy_application_files),
             ("Installing dependencies", self.install_dependencies),
@@ -185,11 +171,8 @@ start_server.bat
         ]
         
         for step_name, step_func in steps:
-            self.log(f"Step: {step_name}")
-            if not step_func():
-                self.log(f"Installation failed at step: {step_name}")
+            if not self.run_step(step_name, step_func):
                 return False
-            self.log(f"Step completed: {step_name}")
             print()
             
         self.log("=" * 50)
@@ -11,8 +11,8 @@ echo.
 :: Change to the directory where this script is located
 cd /d "%~dp0"
 
-:: Start the Flask application
-python3 main.py
+:: Start the Flask application under waitress so requests are served concurrently
+python3 -m waitress --threads=16 --host=0.0.0.0 --port=5000 main:app
 
 echo.
 echo Server stopped.
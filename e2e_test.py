@@ -8,15 +8,78 @@ import time
 import subprocess
 import signal
 import sys
+import select
+import platform
+import getpass
+import socket
+import hashlib
+import mmap
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
 from crontab import CronTab
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 
 from restic_installer_scripts.linux import restic_removal_linux, download_restic_linux
 from restic_installer_scripts.windows import restic_removal_windows, download_restic_windows
+
+# Platform detected once; installer helpers dispatched by OS name
+CURRENT_OS = platform.system().lower()
+RESTIC_REMOVERS = {'linux': restic_removal_linux, 'windows': restic_removal_windows}
+RESTIC_DOWNLOADERS = {'linux': download_restic_linux, 'windows': download_restic_windows}
+
 # Test configuration
 BASE_URL = 'http://localhost:5000'
+SERVER_ADDRESS = ('localhost', 5000)
 SERVER_PROCESS = None
+TEST_PASSWORD = 'test_password_123'
+VERBOSE = os.environ.get('E2E_VERBOSE') == '1'
+
+# Per-user crontab spool locations (Debian, then RHEL layout)
+CRON_SPOOL_DIRS = ['/var/spool/cron/crontabs', '/var/spool/cron']
+
+# Test files as (name, content, subdirectory name, subdirectory prefix), built
+# once at import; the subdirectory copy is written as prefix + content in one writev
+TEST_FILES = tuple(
+    (name, content, f'sub_{name}', f'Subdirectory version of {name}\n'.encode('utf-8'))
+    for name, content in [
+        ('document.txt', b'This is a test document with important data.'),
+        ('config.json', b'{"setting1": "value1", "setting2": "value2"}'),
+        ('data.csv', b'name,age,city\nJohn,30,NYC\nJane,25,LA'),
+        ('script.py', b'print("Hello, World!")\nprint("This is a backup test")'),
+    ]
+)
+
+# Files below this size are compared directly instead of hashed
+SMALL_FILE_SIZE = 4096
+
+# Files at or above this size are hashed through mmap
+MMAP_FILE_SIZE = 4 * 1024 * 1024
+
+# Last /config response and its ETag, reused while the server answers 304
+_CONFIG_CACHE = {'etag': None, 'body': None}
+
+# Shared keep-alive session so API calls reuse pooled connections
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+SESSION.headers['X-Restic-Password'] = TEST_PASSWORD
+
+# Separate session for GitHub (it must not see the password header); the release
+# lookup and binary download then share one TLS connection pool
+GITHUB_SESSION = requests.Session()
+GITHUB_SESSION.mount('https://', HTTPAdapter(max_retries=Retry(total=2, backoff_factor=0.1)))
 
 def start_server():
     """Start the Flask server in background"""
@@ -25,30 +88,80 @@ def start_server():
     
     # Start server in background
     SERVER_PROCESS = subprocess.Popen(
-        ['python3', 'app.py'],
+        ['python3', 'main.py'],
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        preexec_fn=os.setsid
+        start_new_session=True
     )
     
-    # Wait for server to start
-    for i in range(10):
-        try:
-            response = requests.get(f'{BASE_URL}/config', timeout=2)
-            print("✅ Server started successfully!")
-            return True
-        except:
-            time.sleep(1)
+    # Watch the child through a pidfd (Linux) so a crash ends the wait immediately
+    pidfd = os.pidfd_open(SERVER_PROCESS.pid) if hasattr(os, 'pidfd_open') else None
+    poller = None
+    if pidfd is not None:
+        poller = select.poll()
+        poller.register(pidfd, select.POLLIN)
+    
+    # Wait for the port to accept connections, backing off from 20ms to 200ms
+    deadline = time.monotonic() + 10
+    delay = 0.02
+    try:
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(SERVER_ADDRESS, timeout=0.2).close()
+                print("✅ Server started successfully!")
+                return True
+            except OSError:
+                pass
+            
+            # Sleep until the next probe, waking as soon as the child exits
+            if poller:
+                exited = bool(poller.poll(delay * 1000))
+            else:
+                try:
+                    SERVER_PROCESS.wait(timeout=delay)
+                    exited = True
+                except subprocess.TimeoutExpired:
+                    exited = False
+            if exited:
+                _, stderr = SERVER_PROCESS.communicate()
+                raise TypeError(f"❌ Server process exited during startup (rc={SERVER_PROCESS.returncode}): "
+                                f"{stderr.decode('utf-8', 'replace').strip()}")
+            delay = min(delay * 2, 0.2)
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
     
     raise TypeError("❌ Failed to start server")
     return False
 
+def wait_for_exit(process, timeout):
+    """Wait up to timeout seconds for process to exit, sleeping on a pidfd where available"""
+    if hasattr(os, 'pidfd_open'):
+        pidfd = os.pidfd_open(process.pid)
+        try:
+            poller = select.poll()
+            poller.register(pidfd, select.POLLIN)
+            return bool(poller.poll(timeout * 1000))
+        finally:
+            os.close(pidfd)
+    try:
+        process.wait(timeout=timeout)
+        return True
+    except subprocess.TimeoutExpired:
+        return False
+
 def stop_server():
-    """Stop the Flask server"""
+    """Stop the Flask server and wait for it to exit"""
     global SERVER_PROCESS
     if SERVER_PROCESS:
         print("🛑 Stopping server...")
-        os.killpg(os.getpgid(SERVER_PROCESS.pid), signal.SIGTERM)
+        pgid = os.getpgid(SERVER_PROCESS.pid)
+        os.killpg(pgid, signal.SIGTERM)
+        if not wait_for_exit(SERVER_PROCESS, 2):
+            print("⚠️  Server did not exit after SIGTERM, killing it")
+            os.killpg(pgid, signal.SIGKILL)
+        # Reap the child and release its pipes so the next run starts clean
+        SERVER_PROCESS.communicate()
         SERVER_PROCESS = None
 
 def cleanup_handler(signum, frame):
@@ -60,12 +173,7 @@ def api_call(method, endpoint, data=None, stream=False):
     """Make API call with error handling"""
     url = f'{BASE_URL}{endpoint}'
     try:
-        if method == 'GET':
-            response = requests.get(url, stream=stream)
-        elif method == 'POST':
-            response = requests.post(url, json=data, stream=stream)
-        elif method == 'PUT':
-            response = requests.put(url, json=data, stream=stream)
+        response = SESSION.request(method, url, json=data, stream=stream)
         
         if stream:
             return response
@@ -73,7 +181,8 @@ def api_call(method, endpoint, data=None, stream=False):
         print(f"📡 {method} {endpoint}: {response.status_code}")
         if response.headers.get('content-type', '').startswith('application/json'):
             result = response.json()
-            print(f"   Response: {json.dumps(result, indent=2)}")
+            # Pretty-printing re-serializes the whole body; only do it when asked
+            print(f"   Response: {json.dumps(result, indent=2) if VERBOSE else response.text.rstrip()}")
             return result
         else:
             print(f"   Response: {response.text}")
@@ -83,45 +192,152 @@ def api_call(method, endpoint, data=None, stream=False):
         raise TypeError(f"❌ API call failed: {e}")
         return None
 
+def check_event_line(line, output):
+    """Queue one SSE line for display and fail on error events"""
+    # Skip blank separators and ":" heartbeat comments; only data lines carry events
+    if line.startswith(b'data: '):
+        output.append(f"   📝 {line.decode('utf-8')}\n")
+        # SSE payloads are JSON after the "data: " prefix; parse the raw bytes
+        payload = line[len(b'data: '):]
+        try:
+            event = json_loads(payload)
+        except ValueError:
+            # orjson.JSONDecodeError and json.JSONDecodeError are both ValueErrors;
+            # fall back to a plain substring check for non-JSON payloads
+            failed = b'error' in payload
+        else:
+            if not isinstance(event, dict):
+                raise TypeError(f"❌ Unexpected SSE payload, expected a JSON object: {payload[:200]!r}")
+            event_output = event.get('output', '')
+            failed = 'error' in event or (isinstance(event_output, str) and 'error' in event_output)
+        if failed:
+            raise Exception("Streaming failed as there is error in the output") 
+
+def flush_output(output):
+    """Write queued display lines with a single write + flush"""
+    if output:
+        sys.stdout.write(''.join(output))
+        sys.stdout.flush()
+        output.clear()
+
 def stream_output(response):
     """Stream and display real-time output"""
-    for line in response.iter_lines():  
-        if line:
-            data = line.decode('utf-8').strip()
-            print(f"   📝 {data}")
-            if "error" in data:
-                raise Exception("Streaming failed as there is error in the output") 
+    # Buffer raw chunks and only join/split once a newline arrives, keeping the partial tail
+    chunks = []
+    output = []
+    last_flush = time.monotonic()
+    try:
+        for chunk in response.iter_content(chunk_size=65536):
+            chunks.append(chunk)
+            if b'\n' not in chunk:
+                continue
+            *lines, remainder = b''.join(chunks).split(b'\n')
+            chunks = [remainder]
+            for line in lines:
+                check_event_line(line.rstrip(b'\r'), output)
+            
+            # Display at most every 50ms rather than once per event
+            if time.monotonic() - last_flush >= 0.05:
+                flush_output(output)
+                last_flush = time.monotonic()
+        check_event_line(b''.join(chunks).rstrip(b'\r'), output)
+    finally:
+        flush_output(output)
     return 0
 
+def remove_dirs(paths):
+    """Remove several directory trees in parallel, ignoring errors"""
+    with ThreadPoolExecutor(max_workers=len(paths)) as executor:
+        for path in paths:
+            executor.submit(shutil.rmtree, path, ignore_errors=True)
+
+def make_temp_dirs(stack, *prefixes):
+    """Create world-readable temp directories in /tmp, removed when the stack unwinds"""
+    paths = [tempfile.mkdtemp(prefix=prefix, dir='/tmp') for prefix in prefixes]
+    for path in paths:
+        os.chmod(path, 0o755)
+    
+    def cleanup():
+        print("\n🧹 Cleaning up...")
+        remove_dirs(paths)
+    
+    # The returned list is the one cleaned up, so callers may append to it
+    stack.callback(cleanup)
+    return paths
+
+def write_chunks(filepath, chunks):
+    """Write byte chunks to a file with one writev call where available"""
+    if hasattr(os, 'writev'):
+        fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            # writev may write less than asked; resume after whatever got written
+            chunks = [memoryview(chunk) for chunk in chunks]
+            while chunks:
+                written = os.writev(fd, chunks)
+                while chunks and written >= len(chunks[0]):
+                    written -= len(chunks.pop(0))
+                if chunks:
+                    chunks[0] = chunks[0][written:]
+        finally:
+            os.close(fd)
+    else:
+        with open(filepath, 'wb') as f:
+            f.write(b''.join(chunks))
+
 def create_test_files(directory):
     """Create test files in the given directory"""
-    files_created = []
-    
-    # Create some test files with different content
-    test_files = [
-        ('document.txt', 'This is a test document with important data.'),
-        ('config.json', '{"setting1": "value1", "setting2": "value2"}'),
-        ('data.csv', 'name,age,city\nJohn,30,NYC\nJane,25,LA'),
-        ('script.py', 'print("Hello, World!")\nprint("This is a backup test")'),
-    ]
-    
     # Create a subdirectory with files
     subdir = os.path.join(directory, 'subdir')
     os.makedirs(subdir, exist_ok=True)
     
-    for filename, content in test_files:
-        filepath = os.path.join(directory, filename)
-        with open(filepath, 'w') as f:
-            f.write(content)
-        files_created.append(filepath)
-        
-        # Also create a file in subdirectory
-        sub_filepath = os.path.join(subdir, f'sub_{filename}')
-        with open(sub_filepath, 'w') as f:
-            f.write(f'Subdirectory version of {filename}\n{content}')
-        files_created.append(sub_filepath)
-    
-    return files_created
+    # Precompute (path, chunks) pairs so each file is a single vectored write;
+    # the subdirectory copies reuse the content buffer behind their prefix
+    pending = [(os.path.join(directory, filename), [data]) for filename, data, _, _ in TEST_FILES]
+    pending += [(os.path.join(subdir, sub_name), [prefix, data]) for _, data, sub_name, prefix in TEST_FILES]
+    
+    # The writes target distinct paths, so overlap them; list() surfaces any error
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(write_chunks, *zip(*pending)))
+    
+    return [filepath for filepath, _ in pending]
+
+def walk_scandir(root):
+    """Yield (relative_path, DirEntry) for every file below root"""
+    stack = [(root, '')]
+    while stack:
+        directory, rel_dir = stack.pop()
+        with os.scandir(directory) as it:
+            for entry in it:
+                rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, rel_path))
+                else:
+                    yield rel_path, entry
+
+def hash_file(item):
+    """Return (relative_path, blake2b digest) for a file"""
+    rel_path, full_path = item
+    with open(full_path, 'rb') as f:
+        # Hash large files straight out of the page cache instead of copying chunks
+        if os.fstat(f.fileno()).st_size >= MMAP_FILE_SIZE:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, 'madvise'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                digest = hashlib.blake2b(digest_size=16)
+                digest.update(mm)
+                return rel_path, digest.digest()
+        return rel_path, hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).digest()
+
+def first_difference(path1, path2):
+    """Byte offset of the first difference between two equal-sized files, or None"""
+    offset = 0
+    with open(path1, 'rb') as f1, open(path2, 'rb') as f2:
+        while chunk1 := f1.read(1024 * 1024):
+            chunk2 = f2.read(len(chunk1))
+            if chunk1 != chunk2:
+                return offset + next(i for i, (a, b) in enumerate(zip(chunk1, chunk2)) if a != b)
+            offset += len(chunk1)
+    return None
 
 def compare_directories(dir1, dir2):
     """Compare two directories recursively"""
@@ -129,68 +345,65 @@ def compare_directories(dir1, dir2):
     print(f"   Original: {dir1}")
     print(f"   Restored: {dir2}")
     
-    def get_dir_structure(directory):
-        structure = {}
-        for root, dirs, files in os.walk(directory):
-            rel_root = os.path.relpath(root, directory)
-            if rel_root == '.':
-                rel_root = ''
-            
-            for file in files:
-                rel_path = os.path.join(rel_root, file) if rel_root else file
-                full_path = os.path.join(root, file)
-                with open(full_path, 'r') as f:
-                    structure[rel_path] = f.read()
-        return structure
-    
-    struct1 = get_dir_structure(dir1)
-    struct2 = get_dir_structure(dir2)
+    files1 = dict(walk_scandir(dir1))
+    files2 = dict(walk_scandir(dir2))
     
     # Compare structures
-    if set(struct1.keys()) != set(struct2.keys()):
+    if files1.keys() != files2.keys():
+        print(f"   Original files: {sorted(files1.keys())}")
+        print(f"   Restored files: {sorted(files2.keys())}")
         raise TypeError("❌ Directory structures don't match!")
-        print(f"   Original files: {sorted(struct1.keys())}")
-        print(f"   Restored files: {sorted(struct2.keys())}")
-        return False
     
-    # Compare file contents
-    for file_path in struct1:
-        if struct1[file_path] != struct2[file_path]:
-            raise TypeError(f"❌ File content mismatch: {file_path}")
-            return False
+    # Differing sizes are a mismatch without reading anything; small files are
+    # cheaper to compare byte-for-byte than to hash
+    large_files = []
+    for file_path, entry1 in files1.items():
+        entry2 = files2[file_path]
+        size = entry1.stat(follow_symlinks=False).st_size
+        if size != entry2.stat(follow_symlinks=False).st_size:
+            raise TypeError(f"❌ File size mismatch: {file_path}")
+        if size >= SMALL_FILE_SIZE:
+            large_files.append(file_path)
+        elif Path(entry1.path).read_bytes() != Path(entry2.path).read_bytes():
+            raise TypeError(f"❌ File content mismatch: {file_path} "
+                            f"(first difference at byte {first_difference(entry1.path, entry2.path)})")
+    
+    # Hash the remaining files of both trees in parallel and compare digests;
+    # hashlib and file reads release the GIL, so threads overlap the I/O
+    if large_files:
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+            results1 = executor.map(hash_file, [(p, files1[p].path) for p in large_files])
+            results2 = executor.map(hash_file, [(p, files2[p].path) for p in large_files])
+            digests1 = dict(results1)
+            digests2 = dict(results2)
+        
+        for file_path in large_files:
+            if digests1[file_path] != digests2[file_path]:
+                # Only offenders are re-read, to confirm and locate the difference
+                offset = first_difference(files1[file_path].path, files2[file_path].path)
+                if offset is not None:
+                    raise TypeError(f"❌ File content mismatch: {file_path} (first difference at byte {offset})")
     
     print("✅ Directories match perfectly!")
     return True
 
-
-
 def test_restic_installation():
     """Test restic binary installation functionality"""
     print("\n🔧 Testing Restic Installation...")
     print("=" * 40)
     
     try:
-        import platform
-        import tempfile
-        import requests
-        import shutil
-        
-        # Detect the operating system
-        current_os = platform.system().lower()
-        print(f"🖥️  Detected OS: {current_os}")
+        print(f"🖥️  Detected OS: {CURRENT_OS}")
         
         restic_backup_path = None
         extracted_path = None
         
         # Step 1: Remove existing restic binary (platform-specific)
         print("📦 Backing up and removing existing restic binary...")
-        if current_os == 'linux':
-            restic_backup_path = restic_removal_linux()
-        elif current_os == 'windows':
-            restic_backup_path = restic_removal_windows()
-        else:
-            print(f"⚠️  Unsupported OS: {current_os}")
+        if CURRENT_OS not in RESTIC_REMOVERS:
+            print(f"⚠️  Unsupported OS: {CURRENT_OS}")
             return False
+        restic_backup_path = RESTIC_REMOVERS[CURRENT_OS]()
         
         # Step 2: Test that API returns 'NA' for restic version
         print("🔍 Testing API returns 'NA' when restic is not installed...")
@@ -201,10 +414,7 @@ def test_restic_installation():
         print("✅ API correctly returns 'NA' when restic is not installed")
         
         # Step 3: Download latest binary from GitHub releases (platform-specific)
-        if current_os == 'linux':
-            extracted_path = download_restic_linux()
-        elif current_os == 'windows':
-            extracted_path = download_restic_windows()
+        extracted_path = RESTIC_DOWNLOADERS[CURRENT_OS](GITHUB_SESSION)
         
         if not extracted_path:
             raise TypeError("❌ Failed to download and extract restic binary")
@@ -217,7 +427,7 @@ def test_restic_installation():
             files = {'file': ('restic', binary_file, 'application/octet-stream')}
             data = {'root_password': 'nonbios'}  # Using the user's password
             
-            response = requests.post(f'{BASE_URL}/config/update_restic', files=files, data=data)
+            response = SESSION.post(f'{BASE_URL}/config/update_restic', files=files, data=data)
             
             if response.status_code != 200:
                 raise TypeError(f"❌ Installation API call failed: {response.status_code}")
@@ -227,14 +437,17 @@ def test_restic_installation():
             result = response.json()
             print(f"✅ Installation successful: {result.get('message', 'Unknown')}")
         
-        # Step 5: Verify the version is correctly updated
+        # Step 5: Verify the version is correctly updated; the install response
+        # already carries it, so only fall back to reading the saved config
         print("✅ Verifying installation...")
-        result = api_call('POST', '/config/update_restic', {})
-        if not result or result.get('restic_version') == 'NA':
-            raise TypeError(f"❌ Installation verification failed. Version: {result.get('restic_version') if result else 'No result'}")
+        installed_version = result.get('restic_version')
+        if installed_version is None:
+            installed_version = get_config().get('restic_version')
+        if not installed_version or installed_version == 'NA':
+            raise TypeError(f"❌ Installation verification failed. Version: {installed_version or 'No result'}")
             return False
         
-        print(f"✅ Restic successfully installed! Version: {result.get('restic_version')}")
+        print(f"✅ Restic successfully installed! Version: {installed_version}")
         return True
         
     except Exception as e:
@@ -243,24 +456,23 @@ def test_restic_installation():
     
     finally:
         # Clean up temporary files
-        if extracted_path and os.path.exists(extracted_path):
-            try:
-                temp_dir = os.path.dirname(extracted_path)
-                shutil.rmtree(temp_dir)
-                print("🧹 Cleaned up temporary files")
-            except Exception as e:
-                print(f"⚠️  Warning: Could not clean up temporary files: {e}")
+        if extracted_path:
+            shutil.rmtree(os.path.dirname(extracted_path), ignore_errors=True)
+            print("🧹 Cleaned up temporary files")
         
         # Restore original binary if we backed it up (platform-specific)
-        if restic_backup_path and os.path.exists(restic_backup_path):
+        if restic_backup_path:
             print("🔄 Restoring original restic binary...")
             try:
-                current_os = platform.system().lower()
-                if current_os == 'linux':
-                    os.system(f'sudo cp {restic_backup_path} /usr/bin/restic')
-                    os.system('sudo chmod 755 /usr/bin/restic')
+                if CURRENT_OS == 'linux':
+                    if os.geteuid() == 0:
+                        shutil.copy2(restic_backup_path, '/usr/bin/restic')
+                        os.chmod('/usr/bin/restic', 0o755)
+                    else:
+                        # install copies and sets the mode in one exec, without a shell
+                        subprocess.run(['sudo', 'install', '-m', '755', restic_backup_path, '/usr/bin/restic'], check=True)
                     os.remove(restic_backup_path)
-                elif current_os == 'windows':
+                elif CURRENT_OS == 'windows':
                     # Try to restore to the most common location
                     target_path = 'C:\\Program Files\\restic\\restic.exe'
                     os.makedirs(os.path.dirname(target_path), exist_ok=True)
@@ -277,9 +489,9 @@ def create_backup_location(repo_dir):
     print("\n🏗️  Initializing repository...")
     init_data = {
         'location': repo_dir,
-        'password': 'test_password_123'
+        'password': TEST_PASSWORD
     }
-    response = requests.post(f'{BASE_URL}/locations', json=init_data)
+    response = SESSION.post(f'{BASE_URL}/locations', json=init_data)
     if response.status_code != 200:
         raise TypeError(f"❌ Failed to initialize repository: {response.status_code}, {response.text}")
         print(f"   Response: {response.text}")
@@ -310,11 +522,9 @@ def take_backup_dir(location_id, backup_dir):
     test_files = create_test_files(backup_dir)
     print(f"   Created {len(test_files)} test files")
     
-    # List created files
-    for file_path in test_files:
-        rel_path = os.path.relpath(file_path, backup_dir)
-        size = os.path.getsize(file_path)
-        print(f"   📄 {rel_path} ({size} bytes)")
+    # List created files; scandir entries carry the stat so each file costs one call
+    for rel_path, entry in walk_scandir(backup_dir):
+        print(f"   📄 {rel_path} ({entry.stat(follow_symlinks=False).st_size} bytes)")
     
     # Step 6: Create backup
     backup_data = {
@@ -326,25 +536,34 @@ def take_backup_dir(location_id, backup_dir):
   
     
 def take_backup(location_id, backup_data):
-    headers = {'X-Restic-Password': 'test_password_123'}
-    response = requests.post(f'{BASE_URL}/locations/{location_id}/backups', json=backup_data, headers=headers, stream=True)
-    if response.status_code != 200:
-        raise TypeError(f"❌ Failed to start backup: {response.status_code}")
-        return False
-    
-    exit_code = stream_output(response)
+    # Closing the streamed response hands the keep-alive connection back to the pool
+    with SESSION.post(f'{BASE_URL}/locations/{location_id}/backups', json=backup_data, stream=True) as response:
+        if response.status_code != 200:
+            raise TypeError(f"❌ Failed to start backup: {response.status_code}")
+            return False
+        
+        exit_code = stream_output(response)
     if exit_code != 0:
         raise TypeError("❌ Backup failed")
         return False
     
-def config_updated_with_recent_backup(location_id, backup_dir):
-    # Step 6.1: Verify config was updated with backup path
-    print("\n🔍 Verifying config was updated with backup path...")
-    response = requests.get(f'{BASE_URL}/config')
+def get_config():
+    """Fetch /config, revalidating the last copy with its ETag"""
+    cached = dict(_CONFIG_CACHE)
+    headers = {'If-None-Match': cached['etag']} if cached['etag'] else {}
+    response = SESSION.get(f'{BASE_URL}/config', headers=headers)
+    if response.status_code == 304:
+        return cached['body']
     if response.status_code != 200:
         raise TypeError(f"❌ Failed to get config: {response.status_code}")
     
-    config = response.json()
+    _CONFIG_CACHE.update(etag=response.headers.get('ETag'), body=response.json())
+    return _CONFIG_CACHE['body']
+
+def config_updated_with_recent_backup(location_id, backup_dir):
+    # Step 6.1: Verify config was updated with backup path
+    print("\n🔍 Verifying config was updated with backup path...")
+    config = get_config()
     if location_id not in config.get('locations', {}):
         raise TypeError(f"❌ Location {location_id} not found in config")
     
@@ -360,8 +579,7 @@ def config_updated_with_recent_backup(location_id, backup_dir):
 def check_snapshots_and_get_latest(location_id):
     # Step 7: List snapshots to verify backup
     print("\n📋 Listing snapshots...")
-    headers = {'X-Restic-Password': 'test_password_123'}
-    response = requests.get(f'{BASE_URL}/locations/{location_id}/backups', headers=headers)
+    response = SESSION.get(f'{BASE_URL}/locations/{location_id}/backups')
     if response.status_code != 200:
         raise TypeError(f"❌ Failed to list snapshots: {response.status_code}")
     
@@ -386,20 +604,30 @@ def check_snapshots_and_get_latest(location_id):
 def get_snapshot_content(location_id, snapshot_id):
     # Step 9: List backup contents with recursive option
     print("\n📂 Listing backup contents (recursive)...")
-    headers = {'X-Restic-Password': 'test_password_123'}
-    response = requests.get(f'{BASE_URL}/locations/{location_id}/backups/{snapshot_id}?recursive=true', headers=headers)
-    if response.status_code != 200:
-        print(f"❌ Failed to list backup contents: {response.status_code}")
-        return False
-    
-    backup_contents = response.json()
-    print(f"   📁 Found {len(backup_contents)} items in backup:")
-    for item in backup_contents[:10]:  # Show first 10 items
-        item_type = "📁" if item.get('type') == 'dir' else "📄"
-        size_info = f" ({item.get('size', 0)} bytes)" if item.get('type') == 'file' else ""
-        print(f"   {item_type} {item.get('path', item.get('name', 'unknown'))}{size_info}")
-    if len(backup_contents) > 10:
-        print(f"   ... and {len(backup_contents) - 10} more items")
+    with SESSION.get(f'{BASE_URL}/locations/{location_id}/backups/{snapshot_id}?recursive=true', stream=True) as response:
+        if response.status_code != 200:
+            print(f"❌ Failed to list backup contents: {response.status_code}")
+            return False
+        
+        # With ijson the listing is parsed one entry at a time off the socket,
+        # so a huge snapshot never has to be held in memory as a whole
+        if ijson:
+            response.raw.decode_content = True
+            backup_contents = ijson.items(response.raw, 'item')
+        else:
+            backup_contents = response.json()
+        
+        print("   📁 Items in backup:")
+        count = 0
+        for item in backup_contents:
+            count += 1
+            if count <= 10:  # Show first 10 items
+                item_type = "📁" if item.get('type') == 'dir' else "📄"
+                size_info = f" ({item.get('size', 0)} bytes)" if item.get('type') == 'file' else ""
+                print(f"   {item_type} {item.get('path', item.get('name', 'unknown'))}{size_info}")
+    if count > 10:
+        print(f"   ... and {count - 10} more items")
+    print(f"   📁 Found {count} items in backup")
 
 def restore_backup(location_id, snapshot_id, restore_dir, backup_dir=None, backup_dir_renamed=None):
     # Step 10: Restore backup
@@ -408,13 +636,12 @@ def restore_backup(location_id, snapshot_id, restore_dir, backup_dir=None, backu
         'target': restore_dir
     }
     
-    headers = {'X-Restic-Password': 'test_password_123'}
-    response = requests.post(f'{BASE_URL}/locations/{location_id}/backups/{snapshot_id}/restore', json=restore_data, headers=headers, stream=True)
-    if response.status_code != 200:
-        raise TypeError(f"❌ Failed to start restore: {response.status_code}")
-        return False
-    
-    exit_code = stream_output(response)
+    with SESSION.post(f'{BASE_URL}/locations/{location_id}/backups/{snapshot_id}/restore', json=restore_data, stream=True) as response:
+        if response.status_code != 200:
+            raise TypeError(f"❌ Failed to start restore: {response.status_code}")
+            return False
+        
+        exit_code = stream_output(response)
     if exit_code != 0:
         raise TypeError("❌ Restore failed")
         return False
@@ -425,16 +652,10 @@ def restore_backup(location_id, snapshot_id, restore_dir, backup_dir=None, backu
     # Step 11: Compare original and restored directories
     print("\n🔍 Comparing original and restored data...")
     
-    # The restored directory will have the full path structure
-    # Find the actual restored content
-    restored_content_dir = None
-    for root, dirs, files in os.walk(restore_dir):
-        if os.path.basename(root) == os.path.basename(backup_dir):
-            restored_content_dir = root
-            break
-    
-    if not restored_content_dir:
-        # If not found, the content might be directly in restore_dir
+    # restic restores under the original absolute path, so the content sits at
+    # restore_dir + backup_dir; otherwise it might be directly in restore_dir
+    restored_content_dir = os.path.join(restore_dir, backup_dir.lstrip(os.sep))
+    if not os.path.isdir(restored_content_dir):
         restored_content_dir = restore_dir
     
     
@@ -460,8 +681,7 @@ def schedule_backup(location_id, type, path):
         'frequency': 'daily',
         'time': "02:00",
     }
-    headers = {'X-Restic-Password': 'test_password_123'}
-    response = requests.post(f'{BASE_URL}/locations/{location_id}/schedule', json=schedule_data, headers=headers)
+    response = SESSION.post(f'{BASE_URL}/locations/{location_id}/schedule', json=schedule_data)
 
     if response.status_code != 200:
         raise TypeError(f"❌ Schedule creation failed: {response.status_code}, {response.text}")
@@ -478,57 +698,41 @@ def schedule_backup(location_id, type, path):
     
 def test_backup(type="directory"):
     print(f"\n================================\nTesting {type} based backup\n===============================\n")
-    try: 
-        print("\n📁 Creating temporary directories in /tmp...")
-        import tempfile
-        
-        # Create temporary directories in /tmp
-        repo_dir = tempfile.mkdtemp(prefix='restic_repo_', dir='/tmp')
-        backup_dir = tempfile.mkdtemp(prefix='backup_source_', dir='/tmp')
-        restore_dir = tempfile.mkdtemp(prefix='restore_target_', dir='/tmp')
-        
-        # Set proper permissions
-        os.chmod(repo_dir, 0o755)
-        os.chmod(backup_dir, 0o755)
-        os.chmod(restore_dir, 0o755)
-        
-        
-        print(f"   Repository: {repo_dir}")
-        print(f"   Backup source: {backup_dir}")
-        print(f"   Restore target: {restore_dir}")
-
-        location_id = create_backup_location(repo_dir)
-        
-        if type == "directory":
-            take_backup_dir(location_id,  backup_dir)
-            config_updated_with_recent_backup(location_id, backup_dir)
-        else:
-            command = 'cat /etc/hostname'
-            filename = 'hostname.txt'
-            take_backup_command(location_id, command, filename)
-            config_updated_with_recent_backup(location_id, "/" + filename )
-       
-        snapshot_id = check_snapshots_and_get_latest(location_id)
-        
-        get_snapshot_content(location_id, snapshot_id)
-
-        if type == "directory":
-            backup_dir_renamed = move_dir(backup_dir)
-            return restore_backup(location_id, snapshot_id, restore_dir, backup_dir, backup_dir_renamed)
-        else:
-            return restore_backup(location_id, snapshot_id, restore_dir)
+    with ExitStack() as stack:
+        try: 
+            print("\n📁 Creating temporary directories in /tmp...")
+            temp_dirs = make_temp_dirs(stack, 'restic_repo_', 'backup_source_', 'restore_target_')
+            repo_dir, backup_dir, restore_dir = temp_dirs
+            
+            print(f"   Repository: {repo_dir}")
+            print(f"   Backup source: {backup_dir}")
+            print(f"   Restore target: {restore_dir}")
 
+            location_id = create_backup_location(repo_dir)
+            
+            if type == "directory":
+                take_backup_dir(location_id,  backup_dir)
+                backup_path = backup_dir
+            else:
+                command = 'cat /etc/hostname'
+                filename = 'hostname.txt'
+                take_backup_command(location_id, command, filename)
+                backup_path = "/" + filename
+           
+            config_updated_with_recent_backup(location_id, backup_path)
+            snapshot_id = check_snapshots_and_get_latest(location_id)
+            
+            get_snapshot_content(location_id, snapshot_id)
 
-    except Exception as e:
-        raise TypeError(f"❌ Test failed with exception: {e}")
+            if type == "directory":
+                backup_dir_renamed = move_dir(backup_dir)
+                temp_dirs.append(backup_dir_renamed)
+                return restore_backup(location_id, snapshot_id, restore_dir, backup_dir, backup_dir_renamed)
+            else:
+                return restore_backup(location_id, snapshot_id, restore_dir)
 
-    finally:
-        #Cleanup
-        print("\n🧹 Cleaning up...")
-        shutil.rmtree(repo_dir, ignore_errors=True)
-        if 'backup_dir_renamed' in locals():
-            shutil.rmtree(backup_dir_renamed, ignore_errors=True)
-        shutil.rmtree(restore_dir, ignore_errors=True)
+        except Exception as e:
+            raise TypeError(f"❌ Test failed with exception: {e}")
 
 def check_password_stored_from_schedule(schedule_id):
     print("\n🔑 Verifying password store...")
@@ -549,8 +753,17 @@ def check_password_stored_from_schedule(schedule_id):
        
    
 
+def load_user_crontab():
+    """Read the user's crontab straight from the spool file, falling back to `crontab -l`"""
+    user = getpass.getuser()
+    for spool_dir in CRON_SPOOL_DIRS:
+        tabfile = os.path.join(spool_dir, user)
+        if os.path.isfile(tabfile) and os.access(tabfile, os.R_OK):
+            return CronTab(tabfile=tabfile)
+    return CronTab(user=True)
+
 def retrieve_cron_entry(schedule_id):
-    cron = CronTab(user=True)
+    cron = load_user_crontab()
         
     target_command = None
     jobs = cron.find_comment(f"restic_schedule_{schedule_id}")
@@ -561,7 +774,7 @@ def retrieve_cron_entry(schedule_id):
     return target_command
 
 def get_first_schedule_id(location_id):
-    response = requests.get(f'{BASE_URL}/locations/{location_id}/schedule')
+    response = SESSION.get(f'{BASE_URL}/locations/{location_id}/schedule')
     if response.status_code != 200:
         raise TypeError(f"❌ Schedule GET call failed: {response.status_code}")
     
@@ -578,80 +791,68 @@ def test_schedule_functionality():
     print(f"Testing Schedule Functionality for backup")
     print(f"================================================")
 
-    try:
-        # Create temporary directories
-        import tempfile
-        import time
-        repo_dir = tempfile.mkdtemp(prefix='restic_repo_schedule_', dir='/tmp')
-        backup_dir = tempfile.mkdtemp(prefix='backup_source_', dir='/tmp')
-
-
-        # Set proper permissions
-        os.chmod(repo_dir, 0o755)
-        os.chmod(backup_dir, 0o755)
-
-        print(f"✅ Repository directory: {repo_dir}")
-        print(f"✅ Backup directory: {backup_dir}")
-
-        # Step 1: Initialize repository
-        location_id = create_backup_location(repo_dir)
-
-        #Step 2: schedule backup
-        schedule_id = schedule_backup(location_id, "directory", backup_dir)
-
-        # Step 3: Verify cron job was created
-        print(f"\n🔍 Verifying cron job was created for schedule_id: {schedule_id}")
-        cron_entry = retrieve_cron_entry(schedule_id)
-        if not cron_entry:
-            raise TypeError("Scheduling backup did NOT create cron entry")
-        print(f"✅ Found cron entry for schedule_id: {schedule_id}")
-
-        # Step 4: Check if config is updated with schedule
-        print(f"\n🔍 Get schedule from config to check if schedule_id: {schedule_id} is there")
-        first_schedule_id =  get_first_schedule_id(location_id) 
-        if not first_schedule_id or first_schedule_id != schedule_id:
-            raise TypeError(f"❌ Config does not have {schedule_id} in it")
-        print(f"✅ Config is updated & has {schedule_id} in it")
+    with ExitStack() as stack:
+        try:
+            # Create temporary directories
+            repo_dir, backup_dir = make_temp_dirs(stack, 'restic_repo_schedule_', 'backup_source_')
+
+            print(f"✅ Repository directory: {repo_dir}")
+            print(f"✅ Backup directory: {backup_dir}")
+
+            # Step 1: Initialize repository
+            location_id = create_backup_location(repo_dir)
+
+            #Step 2: schedule backup
+            schedule_id = schedule_backup(location_id, "directory", backup_dir)
+
+            # Step 3: Verify cron job was created
+            print(f"\n🔍 Verifying cron job was created for schedule_id: {schedule_id}")
+            cron_entry = retrieve_cron_entry(schedule_id)
+            if not cron_entry:
+                raise TypeError("Scheduling backup did NOT create cron entry")
+            print(f"✅ Found cron entry for schedule_id: {schedule_id}")
+
+            # Step 4: Check if config is updated with schedule
+            print(f"\n🔍 Get schedule from config to check if schedule_id: {schedule_id} is there")
+            first_schedule_id =  get_first_schedule_id(location_id) 
+            if not first_schedule_id or first_schedule_id != schedule_id:
+                raise TypeError(f"❌ Config does not have {schedule_id} in it")
+            print(f"✅ Config is updated & has {schedule_id} in it")
    
-        # Step 5: Test backup execution using the key with streaming
-        print("\n💾 Testing backup execution with streaming...")
-        response = requests.post(f'{BASE_URL}/locations/{location_id}/schedule/{schedule_id}/execute-backup', stream=True)
-        if response.status_code != 200:
-            raise TypeError(f"❌ Manual backup with key failed: {response.status_code}, {response.text}")
-        stream_output(response)
-        print(f"✅ Streaming backup completed successfully")
-
-        # Step 6: Verify backup was created - if just one snapshot exists, we are good. 
-        check_snapshots_and_get_latest(location_id)
-
-        # Step 7: Clean up - remove cron job by calling the DELETE API 
-        print(f"\n🔍 Verifying cron job was removed for schedule_id: {schedule_id}")
-        response = requests.delete(f'{BASE_URL}/locations/{location_id}/schedule/{schedule_id}')
-        if response.status_code != 200:
-            raise TypeError(f"❌ deletion of scheduled backup failed: {response.status_code}")
-        cron_entry = retrieve_cron_entry(schedule_id)
-        if cron_entry:
-            raise TypeError(f"Cron entry still exists even after the schedule is deleted")
-        print(f"✅ Cron job is removed")
-
-        # Step 8: Check if config schedule is updated
-        print(f"\n🔍 Checking if backup with schedule_id: {schedule_id} is removed")
-        if get_first_schedule_id(location_id):
-            raise TypeError(f"❌ Config still has {schedule_id} in it")
-        print(f"✅ Config is updated & has {schedule_id} is removed")
+            # Step 5: Test backup execution using the key with streaming
+            print("\n💾 Testing backup execution with streaming...")
+            with SESSION.post(f'{BASE_URL}/locations/{location_id}/schedule/{schedule_id}/execute-backup', stream=True) as response:
+                if response.status_code != 200:
+                    raise TypeError(f"❌ Manual backup with key failed: {response.status_code}, {response.text}")
+                stream_output(response)
+            print(f"✅ Streaming backup completed successfully")
+
+            # Step 6: Verify backup was created - if just one snapshot exists, we are good. 
+            check_snapshots_and_get_latest(location_id)
+
+            # Step 7: Clean up - remove cron job by calling the DELETE API 
+            print(f"\n🔍 Verifying cron job was removed for schedule_id: {schedule_id}")
+            response = SESSION.delete(f'{BASE_URL}/locations/{location_id}/schedule/{schedule_id}')
+            if response.status_code != 200:
+                raise TypeError(f"❌ deletion of scheduled backup failed: {response.status_code}")
+            cron_entry = retrieve_cron_entry(schedule_id)
+            if cron_entry:
+                raise TypeError(f"Cron entry still exists even after the schedule is deleted")
+            print(f"✅ Cron job is removed")
+
+            # Step 8: Check if config schedule is updated
+            print(f"\n🔍 Checking if backup with schedule_id: {schedule_id} is removed")
+            if get_first_schedule_id(location_id):
+                raise TypeError(f"❌ Config still has {schedule_id} in it")
+            print(f"✅ Config is updated & has {schedule_id} is removed")
    
 
-        print("✅ Schedule functionality test passed!")
-        return True
+            print("✅ Schedule functionality test passed!")
+            return True
 
-    except Exception as e:
-        print(f"❌ Schedule test failed with exception: {e}")
-        return False
-    finally:
-        #Cleanup
-        print("\n🧹 Cleaning up...")
-        shutil.rmtree(repo_dir, ignore_errors=True)
-        shutil.rmtree(backup_dir, ignore_errors=True)
+        except Exception as e:
+            print(f"❌ Schedule test failed with exception: {e}")
+            return False
     
 def main():
     """Main end-to-end test function"""
@@ -677,11 +878,13 @@ def main():
         
         #Use the new /config/update_restic API to set restic version
         result = api_call('POST', '/config/update_restic', {})
-        if not result or 'restic_version' not in str(result):
+        if not isinstance(result, dict) or 'restic_version' not in result:
             raise TypeError("❌ Failed to update restic configuration")
             return False
         print(f"✅ Restic version updated: {result.get('restic_version', 'Unknown')}")
         
+        # Run the backup flavours one after the other: the server's config
+        # load -> modify -> save is not atomic across concurrent requests
         success = test_backup("command") \
         and test_backup("directory") \
         and test_schedule_functionality()
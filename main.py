@@ -1,4 +1,4 @@
-from flask import jsonify, send_from_directory
+from flask import jsonify, request, send_from_directory
 from flask import render_template
 
 import os
@@ -13,14 +13,15 @@ from utils import load_config
 # Serve the web UI
 @app.route('/')
 def index():
-    return send_from_directory('basic-web-ui', 'index.html')
+    # Always revalidate the page shell; the ETag turns warm loads into 304s
+    return send_from_directory('basic-web-ui', 'index.html', conditional=True, max_age=0)
 
 @app.route('/<path:filename>')
 def serve_static(filename):
     if filename.startswith('basic-web-ui/'):
         # Remove the basic-web-ui/ prefix and serve from the directory
         actual_filename = filename[len('basic-web-ui/'):]
-        return send_from_directory('basic-web-ui', actual_filename)
+        return send_from_directory('basic-web-ui', actual_filename, conditional=True, max_age=3600)
     return "File not found", 404
 
 
@@ -30,7 +31,10 @@ def get_config():
     """Get current configuration"""
     try:
         config = load_config()
-        return jsonify(config)
+        response = jsonify(config)
+        # Let clients revalidate with If-None-Match and get a 304 when nothing changed
+        response.add_etag()
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -43,5 +47,14 @@ def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+    if serve is not None:
+        # Multi-threaded server so a slow /browse or /view doesn't block other requests
+        serve(app, host='0.0.0.0', port=5000, threads=16)
+    else:
+        # The debugger/reloader roughly doubles per-request overhead; opt in with DEV=1
+        app.run(debug=bool(os.environ.get('DEV')), host='0.0.0.0', port=5000, threaded=True)
 
@@ -6,17 +6,19 @@ import platform
 import zipfile
 import tarfile
 import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from flask import jsonify, request
 from app_factory import app
 from utils import load_config, save_config
+from restic_installer_scripts.github import get_latest_release
+
+# Shared pool for walking subdirectories of /size in parallel
+size_pool = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 4) * 4))
 
 def get_latest_restic_version():
-    """Get the latest restic version from GitHub API"""
+    """Get the latest restic version from GitHub API (cached by restic_installer_scripts.github)"""
     try:
-        response = requests.get('https://api.github.com/repos/restic/restic/releases/latest')
-        if response.status_code == 200:
-            return response.json()['tag_name'].lstrip('v')
-        return None
+        return get_latest_release()['tag_name'].lstrip('v')
     except Exception as e:
         print(f"Error getting latest restic version: {e}")
         return None
@@ -149,6 +151,58 @@ def install_restic():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+def _walk_size(path):
+    """Sum the sizes of all files below path, skipping entries that can't be accessed"""
+    # scandir's DirEntry carries the file type from readdir, so each file costs
+    # a single stat for its size instead of os.walk's isdir plus getsize
+    total_size = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file():
+                            # Like getsize, count symlinked files at their target's size
+                            total_size += entry.stat().st_size
+                    except OSError:
+                        # Skip files that can't be accessed
+                        continue
+        except OSError:
+            continue
+    return total_size
+
+def _parallel_walk_size(path):
+    """Like _walk_size, but walks each top-level subdirectory on size_pool"""
+    total_size = 0
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file():
+                        total_size += entry.stat().st_size
+                except OSError:
+                    continue
+    except OSError:
+        # Unreadable directory counts as empty, like _walk_size
+        return 0
+    
+    # Not worth the hand-off for a single subtree
+    if len(subdirs) < 2:
+        return total_size + sum(map(_walk_size, subdirs))
+    
+    # scandir and stat release the GIL, so the walkers overlap their I/O waits
+    futures = [size_pool.submit(_walk_size, subdir) for subdir in subdirs]
+    for future in as_completed(futures):
+        total_size += future.result()
+    return total_size
+
 @app.route('/size', methods=['GET'])
 def get_directory_size():
     """Get directory size information"""
@@ -164,16 +218,7 @@ def get_directory_size():
         if os.path.exists(path):
             # Get directory size (used space)
             if os.path.isdir(path):
-                total_size = 0
-                for dirpath, dirnames, filenames in os.walk(path):
-                    for filename in filenames:
-                        filepath = os.path.join(dirpath, filename)
-                        try:
-                            total_size += os.path.getsize(filepath)
-                        except (OSError, IOError):
-                            # Skip files that can't be accessed
-                            continue
-                used_space = total_size
+                used_space = _parallel_walk_size(path)
             else:
                 # Single file
                 used_space = os.path.getsize(path)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+GitHub release lookup shared by the platform installer scripts and the API
+"""
+
+import time
+
+import requests
+
+RELEASES_URL = "https://api.github.com/repos/restic/restic/releases/latest"
+
+# Latest release as (fetched_at, release JSON, etag, asset name -> URL), reused
+# for RELEASE_CACHE_TTL seconds; replaced as one tuple so readers never see a mix
+RELEASE_CACHE_TTL = 600
+_release_cache = None
+
+def _get_release_entry(session=None):
+    """Return the cached release entry, refreshing it once RELEASE_CACHE_TTL has passed"""
+    global _release_cache
+    now = time.monotonic()
+    hit = _release_cache
+    if hit and now - hit[0] < RELEASE_CACHE_TTL:
+        return hit
+    try:
+        # Revalidate with the ETag; GitHub doesn't count 304s against the rate limit
+        headers = {'If-None-Match': hit[2]} if hit and hit[2] else {}
+        response = (session or requests).get(RELEASES_URL, headers=headers, timeout=10)
+        if response.status_code == 304 and hit:
+            _release_cache = (now,) + hit[1:]
+            return _release_cache
+        response.raise_for_status()
+        release = response.json()
+        assets = {asset['name']: asset['browser_download_url'] for asset in release.get('assets', [])}
+        _release_cache = (now, release, response.headers.get('ETag'), assets)
+        return _release_cache
+    except requests.RequestException:
+        # Rate limited or failing: a stale release beats none
+        if hit:
+            return hit
+        raise
+
+def get_latest_release(session=None):
+    """
+    Fetch the latest restic release JSON, cached for RELEASE_CACHE_TTL seconds
+
+    Raises requests.RequestException if it can't be fetched and nothing is cached.
+    """
+    return _get_release_entry(session)[1]
+
+def get_release_assets(session=None):
+    """Map asset name to download URL for the latest release, built once per fetch"""
+    return _get_release_entry(session)[3]
+
+def find_asset(plat_tag, ext, session=None):
+    """Return (name, url) of the first latest-release asset matching plat_tag and ext, or None"""
+    return next(((name, url) for name, url in get_release_assets(session).items()
+                 if plat_tag in name and name.endswith(ext)), None)
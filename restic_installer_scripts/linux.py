@@ -116,62 +116,73 @@ def restic_removal_linux():
     
     # Remove restic binary
     print("🗑️  Removing restic binary...")
-    if os.path.exists('/usr/bin/restic'):
-        os.system('sudo rm -f /usr/bin/restic')
-    if os.path.exists('/usr/local/bin/restic'):
-        os.system('sudo rm -f /usr/local/bin/restic')
+    targets = [p for p in ('/usr/bin/restic', '/usr/local/bin/restic') if os.path.exists(p)]
+    if targets:
+        if os.geteuid() == 0:
+            for path in targets:
+                os.unlink(path)
+        else:
+            subprocess.run(['sudo', 'rm', '-f', *targets], check=True)
     
     return restic_backup_path
 
-def download_restic_linux():
-    """Download and prepare restic binary for Linux"""
+def download_restic_linux(session=None):
+    """Download and prepare restic binary for Linux; pass a requests.Session
+    to reuse its connection pool for both GitHub requests"""
     import tempfile
     import requests
     import bz2
     import shutil
     import stat
     import os
+    from restic_installer_scripts.github import find_asset
     
     print("⬇️  Downloading latest restic binary from GitHub...")
-    releases_url = "https://api.github.com/repos/restic/restic/releases/latest"
-    response = requests.get(releases_url)
-    if response.status_code != 200:
-        print(f"❌ Failed to fetch release info: {response.status_code}")
+    http = session or requests
+    try:
+        # Find Linux amd64 asset
+        asset = find_asset('linux_amd64', '.bz2', session)
+    except requests.RequestException as e:
+        print(f"❌ Failed to fetch release info: {e}")
         return None
     
-    release_data = response.json()
-    download_url = None
-    
-    # Find Linux amd64 asset
-    for asset in release_data.get('assets', []):
-        if 'linux_amd64' in asset['name'] and asset['name'].endswith('.bz2'):
-            download_url = asset['browser_download_url']
-            filename = asset['name']
-            break
-    
-    if not download_url:
+    if not asset:
         print("❌ Could not find Linux amd64 binary in latest release")
         return None
     
+    filename, download_url = asset
     print(f"   📥 Downloading: {filename}")
     
-    # Download and extract the binary
+    # Download and extract the binary, decompressing the bz2 stream straight
+    # off the socket so neither the archive nor the binary is held in memory
     temp_dir = tempfile.mkdtemp()
-    archive_path = os.path.join(temp_dir, filename)
-    binary_response = requests.get(download_url)
-    if binary_response.status_code != 200:
-        print(f"❌ Failed to download binary: {binary_response.status_code}")
-        return None
-    
-    with open(archive_path, 'wb') as f:
-        f.write(binary_response.content)
-    
-    # Extract bz2 file
-    print("📦 Extracting binary...")
     extracted_path = os.path.join(temp_dir, 'restic')
-    with bz2.BZ2File(archive_path, 'rb') as f_in:
+    with http.get(download_url, stream=True, timeout=30) as binary_response:
+        if binary_response.status_code != 200:
+            print(f"❌ Failed to download binary: {binary_response.status_code}")
+            return None
+        
+        print("📦 Extracting binary...")
+        binary_response.raw.decode_content = True
+        # lbzip2 decompresses the blocks of a plain bzip2 stream across all
+        # cores; pbzip2 only does so for its own output but is no slower
+        bzip2_tool = shutil.which('lbzip2') or shutil.which('pbzip2')
         with open(extracted_path, 'wb') as f_out:
-            shutil.copyfileobj(f_in, f_out)
+            if bzip2_tool:
+                with subprocess.Popen([bzip2_tool, '-dc'], stdin=subprocess.PIPE, stdout=f_out) as process:
+                    try:
+                        shutil.copyfileobj(binary_response.raw, process.stdin, 1024 * 1024)
+                    except BaseException:
+                        # Don't leave the decompressor waiting on a half-fed pipe
+                        process.kill()
+                        raise
+                    # Leaving the with block closes stdin and waits for the child
+                if process.returncode != 0:
+                    print(f"❌ {os.path.basename(bzip2_tool)} failed to extract binary: {process.returncode}")
+                    return None
+            else:
+                with bz2.open(binary_response.raw, 'rb') as f_in:
+                    shutil.copyfileobj(f_in, f_out, 1024 * 1024)
     
     # Make it executable
     os.chmod(extracted_path, stat.S_IRWXU | stat.S_IRGRP | stat.S_IXGRP | stat.S_IROTH | stat.S_IXOTH)
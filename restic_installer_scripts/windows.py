@@ -146,46 +146,56 @@ def restic_removal_windows():
     
     return restic_backup_path
 
-def download_restic_windows():
-    """Download and prepare restic binary for Windows"""
+def find_file(root, name):
+    """Return the path of the first file called name below root, or None"""
+    pending = [root]
+    while pending:
+        with os.scandir(pending.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.name == name:
+                    return entry.path
+    return None
+
+def download_restic_windows(session=None):
+    """Download and prepare restic binary for Windows; pass a requests.Session
+    to reuse its connection pool for both GitHub requests"""
     import tempfile
     import requests
     import zipfile
+    import shutil
     import os
+    from restic_installer_scripts.github import find_asset
     
     print("⬇️  Downloading latest restic binary from GitHub...")
-    releases_url = "https://api.github.com/repos/restic/restic/releases/latest"
-    response = requests.get(releases_url)
-    if response.status_code != 200:
-        print(f"❌ Failed to fetch release info: {response.status_code}")
+    http = session or requests
+    try:
+        # Find Windows amd64 asset
+        asset = find_asset('windows_amd64', '.zip', session)
+    except requests.RequestException as e:
+        print(f"❌ Failed to fetch release info: {e}")
         return None
     
-    release_data = response.json()
-    download_url = None
-    
-    # Find Windows amd64 asset
-    for asset in release_data.get('assets', []):
-        if 'windows_amd64' in asset['name'] and asset['name'].endswith('.zip'):
-            download_url = asset['browser_download_url']
-            filename = asset['name']
-            break
-    
-    if not download_url:
+    if not asset:
         print("❌ Could not find Windows amd64 binary in latest release")
         return None
     
+    filename, download_url = asset
     print(f"   📥 Downloading: {filename}")
     
     # Download and extract the binary
     temp_dir = tempfile.mkdtemp()
     archive_path = os.path.join(temp_dir, filename)
-    binary_response = requests.get(download_url)
-    if binary_response.status_code != 200:
-        print(f"❌ Failed to download binary: {binary_response.status_code}")
-        return None
-    
-    with open(archive_path, 'wb') as f:
-        f.write(binary_response.content)
+    # Stream to disk in 1 MiB copies; zipfile needs a seekable file, so the archive is kept
+    with http.get(download_url, stream=True, timeout=30) as binary_response:
+        if binary_response.status_code != 200:
+            print(f"❌ Failed to download binary: {binary_response.status_code}")
+            return None
+        
+        binary_response.raw.decode_content = True
+        with open(archive_path, 'wb') as f:
+            shutil.copyfileobj(binary_response.raw, f, 1024 * 1024)
     
     # Extract zip file
     print("📦 Extracting binary...")
@@ -195,12 +205,9 @@ def download_restic_windows():
     # Find the extracted restic.exe
     extracted_path = os.path.join(temp_dir, 'restic.exe')
     if not os.path.exists(extracted_path):
-        # Look for it in subdirectories
-        for root, dirs, files in os.walk(temp_dir):
-            for file in files:
-                if file == 'restic.exe':
-                    extracted_path = os.path.join(root, file)
-                    break
+        # Look for it in subdirectories, stopping at the first match; scandir's
+        # DirEntry already knows the type, so no extra stat per entry
+        extracted_path = find_file(temp_dir, 'restic.exe') or extracted_path
     
     if not os.path.exists(extracted_path):
         print("❌ Could not find restic.exe in extracted files")
@@ -2,4 +2,7 @@
 cd "$(dirname "$0")"
 python3 -m venv venv
 source venv/bin/activate
+if command -v gunicorn >/dev/null 2>&1; then
+    exec gunicorn --worker-class gthread --workers 2 --threads 8 -b 0.0.0.0:5000 wsgi:app
+fi
 python main.py
@@ -2,9 +2,36 @@ import os
 import json
 import subprocess
 import re
+import shlex
+import tempfile
+import threading
+import queue
+from functools import lru_cache
 
 from flask import Response, jsonify, request
 
+try:
+    import orjson
+    json_loads = orjson.loads
+    json_dumpb = orjson.dumps
+except ImportError:
+    json_loads = json.loads
+    def json_dumpb(obj):
+        return json.dumps(obj).encode()
+
+# SSE frames are built as bytes so Werkzeug passes them through without re-encoding
+SSE_PREFIX = b'data: '
+SSE_SUFFIX = b'\n\n'
+# Comment frame sent while restic is silent, so proxies don't time the stream out
+SSE_HEARTBEAT = b':\n\n'
+HEARTBEAT_INTERVAL = 15
+# Stop proxies (nginx) and caches from holding back progress events
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+def sse_event(payload):
+    """Encode a payload as one server-sent event frame"""
+    return SSE_PREFIX + json_dumpb(payload) + SSE_SUFFIX
+
 # Configuration file path
 CONFIG_DIR = os.path.expanduser('~/.restic-api')
 CONFIG_FILE = os.path.join(CONFIG_DIR, 'config.json')
@@ -15,19 +42,46 @@ def ensure_config_dir():
     if not os.path.exists(CONFIG_DIR):
         os.makedirs(CONFIG_DIR)
 
+# Raw config.json bytes and the file identity they were read from, swapped as one tuple
+_config_cache = (None, None)
+# waitress serves requests on several threads; keep the file swap and the cache in step
+_config_lock = threading.Lock()
+
+def _config_key(st):
+    # save_config replaces the file, so the inode changes on every write
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
 # Helper Functions
 def load_config():
-    """Load configuration from config.json"""
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, 'r') as f:
-            config = json.load(f)
-        return config
-    return {'restic_version': 'NA', 'locations': {}}
+    """Load configuration from config.json, re-reading the file only when it changes"""
+    global _config_cache
+    try:
+        st = os.stat(CONFIG_FILE)
+    except FileNotFoundError:
+        return {'restic_version': 'NA', 'locations': {}}
+    
+    key = _config_key(st)
+    cached_key, data = _config_cache
+    if cached_key != key:
+        with open(CONFIG_FILE, 'rb') as f:
+            data = f.read()
+        _config_cache = (key, data)
+    
+    # Callers mutate the config before saving it, so parse a private copy each
+    # time; orjson parses these few KiB about as fast as unpickling a cached copy
+    return json_loads(data)
 
 def save_config(config):
+    global _config_cache
     ensure_config_dir()
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=2)
+    data = json.dumps(config, indent=2).encode()
+    # Write to a temp file and swap it in so concurrent requests never read a partial file
+    with tempfile.NamedTemporaryFile('wb', dir=CONFIG_DIR, suffix='.tmp', delete=False) as f:
+        f.write(data)
+    with _config_lock:
+        os.replace(f.name, CONFIG_FILE)
+        # Write through so the next load_config doesn't re-read what we just wrote
+        _config_cache = (_config_key(os.stat(CONFIG_FILE)), data)
 
 def load_password_store():
     ensure_config_dir()
@@ -55,6 +109,16 @@ def get_password_from_header():
         return None, {'error': 'X-Restic-Password header is required'}, 400
     return password, None, None
 
+@lru_cache(maxsize=256)
+def split_command(command):
+    """shlex.split a backup command; cached since scheduled backups resend the same one"""
+    if os.name == 'nt':
+        # POSIX mode would eat the backslashes in C:\Tools\pg_dump.exe; non-POSIX
+        # mode keeps them but leaves the quotes around quoted arguments
+        return tuple(arg[1:-1] if len(arg) > 1 and arg[0] == arg[-1] and arg[0] in '"\'' else arg
+                     for arg in shlex.split(command, posix=False))
+    return tuple(shlex.split(command))
+
 def extract_password_and_launch_backup(location_id, data):
     try:
         # Check if key parameter is provided for password lookup
@@ -102,6 +166,11 @@ def extract_password_and_launch_backup(location_id, data):
             backup_command = data['command']
             filename = data['filename']
             
+            # Split the command like a shell would, so quoted arguments stay intact
+            try:
+                command_args = split_command(backup_command)
+            except ValueError as e:
+                return jsonify({'error': f'Invalid command: {e}'}), 400
 
             # Add command backup path to location's paths list for restore functionality
             path = "/" + filename
@@ -109,23 +178,72 @@ def extract_password_and_launch_backup(location_id, data):
                 config['locations'][location_id]['paths'].append(path)
                 save_config(config)
                 
-            # Split the command into arguments for proper execution
-            command_args = backup_command.split()
-            cmd = ['restic', 'backup', '--stdin-filename', filename, '--repo', repo_path, '--stdin-from-command', '--'] + command_args
+            cmd = ['restic', 'backup', '--stdin-filename', filename, '--repo', repo_path, '--stdin-from-command', '--', *command_args]
         else:
             return jsonify({'error': 'type must be either "directory" or "command"'}), 400
         
         env_vars = {'RESTIC_PASSWORD': password}
         
         def event_stream():
-            yield "data: {\"message\": \"Starting backup...\"}\n\n"
+            yield sse_event({'message': 'Starting backup...'})
             yield from generate_backup_stream(cmd, env_vars, location_id)
         
-        return Response(event_stream(), mimetype='text/event-stream')
+        return Response(event_stream(), mimetype='text/event-stream', headers=SSE_HEADERS)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
+def read_chunks_with_timeout(stream, timeout):
+    """Yield pipe chunks, or None whenever the pipe stays silent for timeout seconds"""
+    # Pipes can't be polled with a timeout on Windows, so read on a helper thread
+    chunks = queue.Queue()
+    def reader():
+        try:
+            while chunk := stream.read1(65536):
+                chunks.put(chunk)
+        finally:
+            chunks.put(b'')
+    threading.Thread(target=reader, daemon=True).start()
+    
+    while True:
+        try:
+            chunk = chunks.get(timeout=timeout)
+        except queue.Empty:
+            yield None
+            continue
+        if not chunk:
+            return
+        yield chunk
+
+def iter_output_batches(stream, heartbeat=None):
+    """Yield the complete lines (bytes, newline stripped) from each 64 KiB read of a
+    process pipe. With heartbeat set, also yields None after that many seconds without output"""
+    if heartbeat is None:
+        # read1 returns whatever is available, so lines still stream as restic prints them
+        chunks = iter(lambda: stream.read1(65536), b'')
+    else:
+        chunks = read_chunks_with_timeout(stream, heartbeat)
+    
+    buf = b''
+    for chunk in chunks:
+        if chunk is None:
+            yield None
+            continue
+        buf += chunk
+        *lines, buf = buf.split(b'\n')
+        if lines:
+            yield lines
+    if buf:
+        yield [buf]
+
+def iter_output_lines(stream, heartbeat=None):
+    """Like iter_output_batches, one line at a time"""
+    for batch in iter_output_batches(stream, heartbeat):
+        if batch is None:
+            yield None
+        else:
+            yield from batch
+
 def generate_backup_stream(cmd, env_vars, location_id):
     """Generator function for streaming backup output"""
     process = execute_restic_command(cmd, env_vars, stream_output=True)
@@ -134,16 +252,25 @@ def generate_backup_stream(cmd, env_vars, location_id):
     snapshot_id = None
     
     try:
-        for line in iter(process.stdout.readline, ''):
-            if line:
-                output_lines.append(line)
-                yield f"data: {json.dumps({'output': line.strip()})}\n\n"
+        for batch in iter_output_batches(process.stdout, HEARTBEAT_INTERVAL):
+            if batch is None:
+                yield SSE_HEARTBEAT
+                continue
+            
+            # Lines that arrived in the same read go out as one chunk (one socket write)
+            # rather than one per line; nothing waits on a timer, so latency is unchanged
+            frames = bytearray()
+            for raw_line in batch:
+                line = raw_line.decode('utf-8', 'replace')
+                output_lines.append(line + '\n')
+                frames += sse_event({'output': line.strip()})
                 
                 # Extract snapshot ID from output
                 if 'snapshot' in line.lower() and 'saved' in line.lower():
                     match = re.search(r'snapshot ([a-f0-9]{8})', line)
                     if match:
                         snapshot_id = match.group(1)
+            yield bytes(frames)
         
         process.wait()
         
@@ -154,34 +281,48 @@ def generate_backup_stream(cmd, env_vars, location_id):
             with open(output_file, 'w') as f:
                 f.writelines(output_lines)
         
-        yield f"data: {json.dumps({'completed': True, 'success': process.returncode == 0, 'snapshot_id': snapshot_id})}\n\n"
+        yield sse_event({'completed': True, 'success': process.returncode == 0, 'snapshot_id': snapshot_id})
         
     except Exception as e:
-        yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        yield sse_event({'error': str(e)})
     finally:
         if process.poll() is None:
             process.terminate()
 
-def execute_restic_command(cmd, env_vars=None, stream_output=False):
-    """Execute restic command with optional streaming"""
-    env = os.environ.copy()
+# Snapshot of the process environment, copied per command instead of os.environ
+_base_env = dict(os.environ)
+
+def restic_env(env_vars=None):
+    """Process environment plus the restic-specific variables for one command"""
+    global _base_env
+    # The Windows restic installer prepends to PATH at runtime; pick that up
+    if os.environ.get('PATH') != _base_env.get('PATH'):
+        _base_env = dict(os.environ)
+    env = _base_env.copy()
     if env_vars:
         env.update(env_vars)
+    return env
+
+def execute_restic_command(cmd, env_vars=None, stream_output=False):
+    """Execute restic command with optional streaming"""
+    env = restic_env(env_vars)
     
     if stream_output:
+        # Fully buffered binary pipe; iter_output_lines splits it into lines
         process = subprocess.Popen(
             cmd, 
             stdout=subprocess.PIPE, 
             stderr=subprocess.STDOUT,
-            universal_newlines=True,
+            bufsize=-1,
             env=env
         )
         return process
     else:
+        # Output stays as bytes: JSON callers parse it directly and
+        # the rest decode only what they actually use
         result = subprocess.run(
             cmd,
             capture_output=True,
-            text=True,
             env=env
         )
         return result
\ No newline at end of file
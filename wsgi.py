@@ -0,0 +1,3 @@
+# WSGI entry point for production servers, e.g.
+#   gunicorn --worker-class gthread --workers 2 --threads 8 -b 0.0.0.0:5000 wsgi:app
+from main import app